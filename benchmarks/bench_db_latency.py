@@ -0,0 +1,94 @@
+"""Handler latency benchmark for the MongoDB data layer.
+
+Simulates concurrent updates that each hit the same queries a /start,
+/leaderboard and /stats handler would, once with blocking pymongo calls made
+directly on the event loop and once through the async ``run_db`` layer.
+
+Usage (needs a local mongod):
+    MONGODB_URI=mongodb://localhost:27017 DATABASE_NAME=KYC_Bench \\
+        python benchmarks/bench_db_latency.py --updates 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+os.environ.setdefault('DATABASE_NAME', 'KYC_Bench')
+
+import kycv2  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fake_user(i):
+    return SimpleNamespace(id=1_000_000 + i, username=f'bench{i}', first_name='Bench', last_name=None)
+
+
+def profile(user):
+    return {'$set': {'username': user.username, 'first_name': user.first_name, 'last_name': user.last_name}}
+
+
+def top_activations():
+    return list(kycv2.leaderboard_collection.find().sort('activation_date', -1).limit(10))
+
+
+async def blocking_update(i):
+    """The pre-async handler path: pymongo called straight from the coroutine."""
+    user = fake_user(i)
+    kycv2.users_collection.update_one({'user_id': user.id}, profile(user), upsert=True)
+    kycv2.admins_collection.count_documents({'user_id': user.id})
+    top_activations()
+    await asyncio.sleep(0)
+
+
+async def async_update(i):
+    """The same three queries, each awaited through run_db."""
+    user = fake_user(i)
+    await kycv2.run_db(kycv2.users_collection.update_one, {'user_id': user.id}, profile(user), upsert=True)
+    await kycv2.run_db(kycv2.admins_collection.count_documents, {'user_id': user.id})
+    await kycv2.run_db(top_activations)
+
+
+async def run(handler, updates):
+    latencies = []
+
+    async def timed(i):
+        started = time.perf_counter()
+        await handler(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(updates)))
+    return latencies, time.perf_counter() - wall
+
+
+def report(name, latencies, wall):
+    print(f"{name:<10} p50={percentile(latencies, 50):8.2f}ms "
+          f"p99={percentile(latencies, 99):8.2f}ms "
+          f"mean={statistics.mean(latencies):8.2f}ms wall={wall:6.2f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=500)
+    args = parser.parse_args()
+
+    kycv2.connect_database()
+    kycv2.users_collection.delete_many({'user_id': {'$gte': 1_000_000}})
+    report('blocking', *await run(blocking_update, args.updates))
+    kycv2.users_collection.delete_many({'user_id': {'$gte': 1_000_000}})
+    report('async', *await run(async_update, args.updates))
+    kycv2.users_collection.delete_many({'user_id': {'$gte': 1_000_000}})
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Peak RSS benchmark for broadcast recipient iteration.
+
+Compares loading every user ID into a list (the old ``get_all_users``) with
+streaming fixed-size ``array('q')`` batches through ``read_user_id_batch``.
+Each mode runs in its own subprocess because peak RSS never goes down.
+
+By default the cursor is a synthetic generator of user documents, so no
+database is needed. Pass ``--mongo`` to seed and stream a real collection.
+
+Usage:
+    python benchmarks/bench_recipient_memory.py --users 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+os.environ.setdefault('DATABASE_NAME', 'KYC_Bench')
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_cursor(users):
+    return ({'user_id': 5_000_000_000 + i} for i in range(users))
+
+
+def make_cursor(args, kycv2):
+    if not args.mongo:
+        return synthetic_cursor(args.users)
+    kycv2.connect_database()
+    return kycv2.users_collection.find({}, {'user_id': 1, '_id': 0}, batch_size=args.batch_size)
+
+
+def seed(args):
+    import kycv2
+    from pymongo import InsertOne
+    kycv2.connect_database()
+    kycv2.users_collection.delete_many({})
+    chunk = []
+    for doc in synthetic_cursor(args.users):
+        chunk.append(InsertOne(doc))
+        if len(chunk) == 10_000:
+            kycv2.users_collection.bulk_write(chunk, ordered=False)
+            chunk = []
+    if chunk:
+        kycv2.users_collection.bulk_write(chunk, ordered=False)
+
+
+def run_mode(args):
+    import kycv2
+    baseline = peak_rss_mb()
+    cursor = make_cursor(args, kycv2)
+    started = time.perf_counter()
+    seen = 0
+    if args.mode == 'list':
+        user_ids = [user['user_id'] for user in cursor]
+        first = time.perf_counter() - started
+        for _ in user_ids:
+            seen += 1
+    else:
+        first = None
+        while True:
+            batch = kycv2.read_user_id_batch(cursor, args.batch_size)
+            if not batch:
+                break
+            if first is None:
+                first = time.perf_counter() - started
+            for _ in batch:
+                seen += 1
+    total = time.perf_counter() - started
+    print(f"{args.mode:<7} users={seen} peak_rss={peak_rss_mb():8.1f}MB "
+          f"(+{peak_rss_mb() - baseline:.1f}MB) first_id={first * 1000:8.1f}ms total={total:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--mongo', action='store_true', help='seed and stream a real users collection')
+    parser.add_argument('--mode', choices=['list', 'stream'])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    if args.mongo:
+        seed(args)
+    for mode in ('list', 'stream'):
+        subprocess.run([sys.executable, __file__, '--mode', mode] + sys.argv[1:], check=True)
+
+
+if __name__ == '__main__':
+    main()
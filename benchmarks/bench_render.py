@@ -0,0 +1,115 @@
+"""Per-request allocation and CPU cost of building replies.
+
+Compares rebuilding keyboards and leaderboard text on every request, as the
+handlers used to, with the pre-rendered constants and the version-memoized
+leaderboard text they use now.
+
+Usage:
+    python benchmarks/bench_render.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import kycv2  # noqa: E402
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+ENTRIES = [
+    {
+        'user_id': i,
+        'username': f'user{i}',
+        'phone_number': f'+2567517{i:05d}',
+        'activation_date': datetime.now() - timedelta(minutes=i),
+    }
+    for i in range(kycv2.LEADERBOARD_SIZE)
+]
+
+
+def legacy_start_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("✨ Activate KYC", callback_data="activate_kyc")],
+        [InlineKeyboardButton("📊 Leaderboard", callback_data="show_leaderboard"),
+         InlineKeyboardButton("ℹ️ How To Use", callback_data="how_to_use")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def legacy_force_join_keyboard():
+    buttons = [[InlineKeyboardButton(f"Join {kycv2.CHANNEL_USERNAMES[i]}", url=kycv2.CHANNEL_LINKS[i])]
+               for i in range(len(kycv2.CHANNEL_USERNAMES))]
+    buttons.append([InlineKeyboardButton("✅ I've Joined", callback_data="verify_join")])
+    return InlineKeyboardMarkup(buttons)
+
+
+def legacy_contact_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("📩 Message Admin", url="https://t.me/Silando")],
+        [InlineKeyboardButton("📢 Announcements", url="https://t.me/megahubbots")],
+        [InlineKeyboardButton("💬 Support Channel", url="https://t.me/Freenethubz")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def legacy_leaderboard_text():
+    leaderboard_text = "🏆 <b>KYC Activation Leaderboard</b> 🏆\n\n"
+    leaderboard_text += "Rank | User       | Phone\n"
+    leaderboard_text += "-----|------------|-------\n"
+    for idx, entry in enumerate(ENTRIES[:10], 1):
+        username = entry.get('username', 'Anonymous')[:10]
+        phone = entry.get('phone_number', 'N/A')[:6] + '***'
+        leaderboard_text += f"{idx:<4} | {username:<10} | {phone}\n"
+    leaderboard_text += f"\nTotal Activations: {len(ENTRIES)}"
+    return leaderboard_text
+
+
+def cached_leaderboard_text():
+    return kycv2.leaderboard_cache.rendered()
+
+
+CASES = {
+    'start keyboard': (legacy_start_keyboard, lambda: kycv2.START_KEYBOARD),
+    'force-join keyboard': (legacy_force_join_keyboard, lambda: kycv2.FORCE_JOIN_KEYBOARD),
+    'contact keyboard': (legacy_contact_keyboard, lambda: kycv2.CONTACT_KEYBOARD),
+    'leaderboard text': (legacy_leaderboard_text, cached_leaderboard_text),
+}
+
+
+def measure(func, iterations):
+    start_cpu = time.process_time()
+    for _ in range(iterations):
+        func()
+    cpu = (time.process_time() - start_cpu) / iterations
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [func() for _ in range(min(iterations, 1000))]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    allocated = sum(stat.size_diff for stat in stats if stat.size_diff > 0) / len(results)
+    return cpu * 1e6, allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    kycv2.leaderboard_cache.load(ENTRIES)
+    assert legacy_leaderboard_text() == cached_leaderboard_text()
+
+    print(f"{'case':<22} {'legacy cpu':>12} {'cached cpu':>12} {'legacy bytes':>14} {'cached bytes':>14}")
+    for name, (legacy, cached) in CASES.items():
+        legacy_cpu, legacy_bytes = measure(legacy, args.iterations)
+        cached_cpu, cached_bytes = measure(cached, args.iterations)
+        print(f"{name:<22} {legacy_cpu:10.2f}us {cached_cpu:10.2f}us "
+              f"{legacy_bytes:12.0f}B {cached_bytes:12.0f}B")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Fail if any hot query is planned as a collection scan.
+
+Provisions indexes with ``ensure_indexes`` and then explains every query
+the bot issues on a hot path. Exits non-zero and lists the offenders if
+any winning plan contains a COLLSCAN stage.
+
+Usage (needs a mongod):
+    MONGODB_URI=mongodb://localhost:27017 DATABASE_NAME=KYC_Bench \\
+        python benchmarks/check_query_plans.py
+"""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+os.environ.setdefault('DATABASE_NAME', 'KYC_Bench')
+
+import kycv2  # noqa: E402
+
+
+def hot_queries():
+    today = datetime.now().strftime('%Y-%m-%d')
+    midnight = datetime.now().replace(hour=0, minute=0, second=0)
+    return {
+        'users upsert by user_id': kycv2.users_collection.find({'user_id': 1}),
+        'leaderboard upsert by user_id': kycv2.leaderboard_collection.find({'user_id': 1}),
+        'admins lookup by user_id': kycv2.admins_collection.find({'user_id': 1}),
+        'users joined today': kycv2.users_collection.find({'join_date': {'$gte': today}}),
+        'activations today': kycv2.leaderboard_collection.find({'activation_date': {'$gte': midnight}}),
+        'leaderboard top N': kycv2.leaderboard_collection.find({}).sort('activation_date', -1).limit(10),
+        'broadcast recipients': kycv2.users_collection.find(
+            {'dead': {'$ne': True}, 'user_id': {'$gt': 0}}, {'user_id': 1, '_id': 0}).sort('user_id', 1),
+        'dead users (reachable count)': kycv2.users_collection.find({'dead': True}),
+        'unfinished broadcasts': kycv2.broadcast_jobs_collection.find({'status': 'running'}),
+    }
+
+
+def stages(plan):
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from stages(child)
+
+
+def main():
+    kycv2.connect_database()
+    kycv2.ensure_indexes()
+    failures = []
+    for name, cursor in hot_queries().items():
+        plan = cursor.explain()['queryPlanner']['winningPlan']
+        plan_stages = [stage for stage in stages(plan) if stage]
+        status = 'COLLSCAN' if 'COLLSCAN' in plan_stages else 'ok'
+        print(f"{status:<9} {name:<32} {' <- '.join(plan_stages)}")
+        if status != 'ok':
+            failures.append(name)
+    if failures:
+        print(f"\n{len(failures)} hot queries regressed to COLLSCAN: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""Load-testing harness for the bot's hot flows.
+
+Drives the real ``Application`` built by ``build_application`` with
+synthetic ``Update`` objects. Bot API calls go to a local fake server
+(aiohttp) that adds latency and answers a share of sends with 429
+RetryAfter. MongoDB is a local mongod, or mongomock with ``--mongomock``.
+
+Reports updates/sec and latency percentiles for /start, the activation
+flow (/activatekyc followed by a phone number), /leaderboard and a
+broadcast. Use ``--json`` to append machine-readable results to a file so
+runs can be compared over time.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/load_test.py --users 1000
+    python benchmarks/load_test.py --mongomock --users 200 --flood-rate 0.02
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+BOT_ID = 1
+ADMIN_ID = 42
+USER_ID_BASE = 10_000_000
+
+
+class FakeBotAPI:
+    """Minimal Bot API stand-in with configurable latency and flood waits"""
+
+    FLOODABLE = {'sendMessage', 'sendPhoto', 'sendDocument', 'editMessageText'}
+
+    def __init__(self, latency, jitter, flood_rate, retry_after):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.message_ids = itertools.count(1)
+        self.calls = 0
+        self.floods = 0
+
+    def message(self, chat_id, text=None):
+        return {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': text or '',
+        }
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        data = await request.post()
+        self.calls += 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+        if method in self.FLOODABLE and random.random() < self.flood_rate:
+            self.floods += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+
+        if method == 'getMe':
+            result = {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif method == 'getChatMember':
+            result = {'status': 'member', 'user': {'id': int(data['user_id']), 'is_bot': False, 'first_name': 'U'}}
+        elif method in self.FLOODABLE:
+            result = self.message(data.get('chat_id', 0), data.get('text'))
+            if method == 'sendPhoto':
+                result['photo'] = [{'file_id': 'bench-photo', 'file_unique_id': 'bench-photo', 'width': 1, 'height': 1}]
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self, port):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', port).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Harness:
+    def __init__(self, kycv2, application):
+        self.kycv2 = kycv2
+        self.application = application
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+
+    def message_update(self, user_id, text):
+        from telegram import Update
+        message = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'user{user_id}'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return Update.de_json({'update_id': next(self.update_ids), 'message': message}, self.application.bot)
+
+    async def process(self, update):
+        """Dispatch an update the way the update fetcher does and time it"""
+        started = time.perf_counter()
+        await self.application.update_processor.process_update(
+            update, self.application.process_update(update)
+        )
+        return time.perf_counter() - started
+
+    async def run_flow(self, name, users, make_updates):
+        latencies = []
+
+        async def one_user(user_id):
+            for update in make_updates(user_id):
+                latencies.append(await self.process(update))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_user(USER_ID_BASE + i) for i in range(users)))
+        wall = time.perf_counter() - started
+        return self.summarize(name, latencies, wall)
+
+    async def run_broadcast(self, recipients):
+        kycv2 = self.kycv2
+        kycv2.users_collection.insert_many(
+            [{'user_id': USER_ID_BASE + 1_000_000 + i} for i in range(recipients)]
+        )
+        context = SimpleNamespace(bot=self.application.bot)
+        content = {'type': 'text', 'text': 'benchmark broadcast', 'entities': [], 'parse_mode': None}
+        started = time.perf_counter()
+        await kycv2.start_broadcast(context, ADMIN_ID, content)
+        await asyncio.gather(*kycv2.active_broadcasts)
+        wall = time.perf_counter() - started
+        job = kycv2.broadcast_jobs_collection.find_one(sort=[('_id', -1)])
+        print(f"{'broadcast':<12} sent={job['success']} failed={job['failures']} "
+              f"wall={wall:6.2f}s throughput={job['success'] / wall:8.1f} msg/s")
+        return {'flow': 'broadcast', 'messages': job['success'], 'failures': job['failures'],
+                'wall': wall, 'throughput': job['success'] / wall}
+
+    @staticmethod
+    def summarize(name, latencies, wall):
+        result = {
+            'flow': name,
+            'updates': len(latencies),
+            'updates_per_sec': len(latencies) / wall,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+        print(f"{name:<12} updates={result['updates']:<6} {result['updates_per_sec']:8.1f} upd/s "
+              f"p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms")
+        return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500, help='concurrent simulated users per flow')
+    parser.add_argument('--recipients', type=int, default=2000, help='users to broadcast to')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean fake Bot API latency (s)')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--flood-rate', type=float, default=0.01, help='share of sends answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--mongomock', action='store_true', help='use mongomock instead of a mongod')
+    parser.add_argument('--json', metavar='FILE', help='append results as one JSON line to FILE')
+    args = parser.parse_args()
+
+    os.environ['TELEGRAM_BOT_TOKEN'] = '123:bench'
+    os.environ['BOT_API_BASE_URL'] = f'http://127.0.0.1:{args.port}/bot'
+    os.environ['ADMIN_IDS'] = str(ADMIN_ID)
+    os.environ['METRICS_PORT'] = '0'
+    os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+    os.environ.setdefault('DATABASE_NAME', 'KYC_LoadTest')
+    if args.mongomock:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+
+    import kycv2
+    kycv2.connect_database()
+    kycv2.client.drop_database(kycv2.db.name)
+
+    api = FakeBotAPI(args.latency, args.jitter, args.flood_rate, args.retry_after)
+    await api.start(args.port)
+    application = kycv2.build_application()
+    await application.initialize()
+    await kycv2.post_init(application)
+    await application.bot_data['provisioning']
+    await application.start()
+
+    harness = Harness(kycv2, application)
+    results = [
+        await harness.run_flow('start', args.users, lambda uid: [harness.message_update(uid, '/start')]),
+        await harness.run_flow('activation', args.users, lambda uid: [
+            harness.message_update(uid, '/activatekyc'),
+            harness.message_update(uid, f'+2567{uid % 10_000_000:08d}'),
+        ]),
+        await harness.run_flow('leaderboard', args.users, lambda uid: [harness.message_update(uid, '/leaderboard')]),
+        await harness.run_broadcast(args.recipients),
+    ]
+    print(f"fake Bot API: {api.calls} calls, {api.floods} answered with 429")
+
+    await application.stop()
+    await kycv2.post_stop(application)
+    await application.shutdown()
+    await kycv2.post_shutdown(application)
+    await api.stop()
+
+    if args.json:
+        with open(args.json, 'a') as f:
+            f.write(json.dumps({'timestamp': datetime.now().isoformat(), 'args': vars(args), 'results': results}) + '\n')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
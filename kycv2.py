@@ -1,70 +1,433 @@
 import os
+import argparse
+import atexit
+import csv
+import gzip
 import logging
+import queue
 import random
+import socket
+import sys
+import tempfile
+import uuid
 import asyncio
-from datetime import datetime
+import functools
+import heapq
+import itertools
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import json_util
 from dotenv import load_dotenv
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Union
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
 from telegram import (
     Update, 
     InlineKeyboardMarkup, 
     InlineKeyboardButton,
-    InputMediaPhoto
+    InputMediaPhoto,
+    MessageEntity
 )
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     MessageHandler,
     ContextTypes,
     CallbackQueryHandler,
     filters,
 )
-from telegram.error import BadRequest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from telegram.request import HTTPXRequest
 from aiohttp import web
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler('kyc_bot.log'),
-        logging.StreamHandler()
-    ]
+class RateLimitFilter(logging.Filter):
+    """Let at most `limit` records per call site through in each window
+
+    Records are keyed by the source line that logged them, so a warning
+    inside a broadcast loop counts as one key however many users fail. The
+    first record after a suppressed stretch reports how many were dropped.
+    Errors are never throttled: every unhandled handler exception is logged
+    from one line in the library, and none of those tracebacks may be lost.
+    """
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.windows = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        started, count, suppressed = self.windows.get(key, (now, 0, 0))
+        if now - started >= self.window:
+            started, count = now, 0
+        if count >= self.limit:
+            self.windows[key] = (started, count, suppressed + 1)
+            return False
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+        self.windows[key] = (started, count + 1, 0)
+        return True
+
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_file_handler = RotatingFileHandler(
+    os.getenv('LOG_FILE', 'kyc_bot.log'),
+    maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backupCount=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+    encoding='utf-8'
 )
+log_stream_handler = logging.StreamHandler()
+for handler in (log_file_handler, log_stream_handler):
+    handler.setFormatter(log_formatter)
+
+# Handlers run on the listener's thread; the event loop only enqueues records
+log_queue = queue.SimpleQueue()
+log_queue_handler = QueueHandler(log_queue)
+# The listener's handlers apply the real format; this just renders the message
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+log_queue_handler.addFilter(RateLimitFilter(
+    int(os.getenv('LOG_RATE_LIMIT', 20)),
+    float(os.getenv('LOG_RATE_WINDOW', 60))
+))
+log_listener = QueueListener(log_queue, log_file_handler, log_stream_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logging.basicConfig(level=logging.INFO, handlers=[log_queue_handler])
 logger = logging.getLogger(__name__)
 
 # Bot configuration
 CONFIG = {
     'token': os.getenv('TELEGRAM_BOT_TOKEN'),
     'admin_ids': [int(id) for id in os.getenv('ADMIN_IDS', '').split(',') if id],
-    'welcome_image': os.getenv('WELCOME_IMAGE_URL', 'https://envs.sh/7_3.jpg')
+    'welcome_image': os.getenv('WELCOME_IMAGE_URL', 'https://envs.sh/7_3.jpg'),
+    'api_base_url': os.getenv('BOT_API_BASE_URL', 'https://api.telegram.org/bot')
 }
 
 # Force Join Configuration
 CHANNEL_USERNAMES = os.getenv("CHANNEL_USERNAMES", "@megahubbots,@Freenethubz,@Freenethubchannel").split(",")
 CHANNEL_LINKS = os.getenv("CHANNEL_LINKS", "https://t.me/megahubbots,https://t.me/Freenethubz,https://t.me/Freenethubchannel").split(",")
 
+# Membership cache configuration
+MEMBERSHIP_CACHE_SIZE = int(os.getenv('MEMBERSHIP_CACHE_SIZE', 50000))
+MEMBERSHIP_POSITIVE_TTL = float(os.getenv('MEMBERSHIP_POSITIVE_TTL', 600))
+MEMBERSHIP_NEGATIVE_TTL = float(os.getenv('MEMBERSHIP_NEGATIVE_TTL', 15))
+
+# Broadcast configuration
+# Telegram allows roughly 30 messages per second across all chats.
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', 25))
+# Tokens the limiter may bank; kept small so a broadcast can't open with a burst
+BROADCAST_BURST = float(os.getenv('BROADCAST_BURST', 1))
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', 10))
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', 3))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', 15))
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', 1000))
+
+# Animation configuration
+ANIMATION_FRAME_INTERVAL = float(os.getenv('ANIMATION_FRAME_INTERVAL', 0.7))
+ANIMATION_MAX_IN_FLIGHT = int(os.getenv('ANIMATION_MAX_IN_FLIGHT', 50))
+
+# Update processing configuration
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', 256))
+USER_RATE_LIMIT = float(os.getenv('USER_RATE_LIMIT', 1))
+USER_RATE_BURST = int(os.getenv('USER_RATE_BURST', 5))
+USER_RATE_LIMITER_SIZE = int(os.getenv('USER_RATE_LIMITER_SIZE', 100000))
+
+# Admin cache configuration
+ADMIN_POLL_INTERVAL = float(os.getenv('ADMIN_POLL_INTERVAL', 60))
+
+# User write buffer configuration
+USER_WRITE_BATCH_SIZE = int(os.getenv('USER_WRITE_BATCH_SIZE', 500))
+USER_WRITE_INTERVAL = float(os.getenv('USER_WRITE_INTERVAL', 2))
+USER_WRITE_REMEMBERED = int(os.getenv('USER_WRITE_REMEMBERED', 50000))
+
+# Stats configuration
+STATS_RECONCILE_INTERVAL = float(os.getenv('STATS_RECONCILE_INTERVAL', 300))
+
+# Leaderboard configuration
+LEADERBOARD_SIZE = 10
+LEADERBOARD_REFRESH_INTERVAL = float(os.getenv('LEADERBOARD_REFRESH_INTERVAL', 60))
+
+# Export and archival configuration
+# Leaderboard rows older than LEADERBOARD_ARCHIVE_DAYS move to leaderboard_archive,
+# so the hot collection only holds recent activations.
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 100000))
+LEADERBOARD_ARCHIVE_DAYS = float(os.getenv('LEADERBOARD_ARCHIVE_DAYS', 30))
+ARCHIVE_INTERVAL = float(os.getenv('ARCHIVE_INTERVAL', 6 * 60 * 60))
+
+# Startup timing
+PROCESS_STARTED = time.monotonic()
+
+# Metrics configuration
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9100))
+BOT_API_POOL_SIZE = int(os.getenv('BOT_API_POOL_SIZE', 64))
+
+# Metrics
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = defaultdict(float)
+
+    def inc(self, *label_values, amount=1):
+        self.values[label_values] += amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+class Histogram:
+    """Cumulative histogram with Prometheus-style buckets"""
+
+    kind = 'histogram'
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = defaultdict(lambda: [0] * len(self.buckets))
+        self.sums = defaultdict(float)
+        self.totals = defaultdict(int)
+
+    def observe(self, value, *label_values):
+        counts = self.counts[label_values]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.sums[label_values] += value
+        self.totals[label_values] += 1
+
+    def samples(self):
+        for label_values, counts in list(self.counts.items()):
+            labels = dict(zip(self.labels, label_values))
+            for bound, count in zip(self.buckets, counts):
+                yield f'{self.name}_bucket', {**labels, 'le': str(bound)}, count
+            yield f'{self.name}_bucket', {**labels, 'le': '+Inf'}, self.totals[label_values]
+            yield f'{self.name}_sum', labels, self.sums[label_values]
+            yield f'{self.name}_count', labels, self.totals[label_values]
+
+class CallbackMetric:
+    """Metric whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, {}, self.callback()
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                    lines.append(f'{name}{{{label_text}}} {value}')
+                else:
+                    lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+HANDLER_LATENCY = metrics.register(Histogram(
+    'kyc_handler_duration_seconds', 'Time spent in each update handler', ('handler',)))
+HANDLER_ERRORS = metrics.register(Counter(
+    'kyc_handler_errors_total', 'Update handlers that raised an exception', ('handler',)))
+MONGO_LATENCY = metrics.register(Histogram(
+    'kyc_mongo_operation_duration_seconds', 'Time spent in MongoDB operations, including pool wait', ('operation',)))
+MONGO_ERRORS = metrics.register(Counter(
+    'kyc_mongo_errors_total', 'MongoDB operations that raised an exception', ('operation',)))
+BOT_API_CALLS = metrics.register(Counter(
+    'kyc_bot_api_calls_total', 'Bot API requests by method and HTTP status', ('method', 'status')))
+BOT_API_LATENCY = metrics.register(Histogram(
+    'kyc_bot_api_duration_seconds', 'Bot API request latency', ('method',)))
+UPDATES_SHED = metrics.register(Counter(
+    'kyc_updates_shed_total', 'Updates dropped by the per-user rate limiter', ('kind',)))
+BROADCAST_MESSAGES = metrics.register(Counter(
+    'kyc_broadcast_messages_total', 'Broadcast deliveries by result', ('result',)))
+STARTUP_SECONDS = {}
+metrics.register(CallbackMetric(
+    'kyc_cold_start_seconds', 'Seconds from module load until startup provisioning finished',
+    lambda: STARTUP_SECONDS.get('ready', 0)))
+EVENT_LOOP_LAG = metrics.register(Histogram(
+    'kyc_event_loop_lag_seconds', 'Delay between when a timer was due and when it ran',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)))
+metrics.register(CallbackMetric(
+    'kyc_membership_cache_hits_total', 'Membership cache hits', lambda: membership_cache.hits, kind='counter'))
+metrics.register(CallbackMetric(
+    'kyc_membership_cache_misses_total', 'Membership cache misses', lambda: membership_cache.misses, kind='counter'))
+metrics.register(CallbackMetric(
+    'kyc_membership_cache_evictions_total', 'Membership cache evictions', lambda: membership_cache.evictions, kind='counter'))
+metrics.register(CallbackMetric(
+    'kyc_active_broadcasts', 'Broadcast jobs currently running', lambda: len(active_broadcasts)))
+metrics.register(CallbackMetric(
+    'kyc_active_animations', 'Animations currently scheduled or editing', lambda: animation_scheduler.active))
+metrics.register(CallbackMetric(
+    'kyc_animation_frames_skipped_total', 'Animation frames coalesced away', lambda: animation_scheduler.frames_skipped, kind='counter'))
+metrics.register(CallbackMetric(
+    'kyc_pending_user_writes', 'User upserts waiting in the write-behind buffer', lambda: len(user_write_buffer.pending)))
+
+def instrumented(handler):
+    """Record latency and errors for an update handler"""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(handler.__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, handler.__name__)
+    return wrapper
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that counts and times every Bot API call"""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+            return status, payload
+        finally:
+            BOT_API_CALLS.inc(api_method, str(status))
+            BOT_API_LATENCY.observe(time.perf_counter() - started, api_method)
+
+async def monitor_event_loop_lag(interval=0.5):
+    """Measure how late the event loop wakes up from a fixed sleep"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+async def handle_metrics(request):
+    return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+async def start_metrics_server():
+    """Serve /metrics on METRICS_PORT, separate from the webhook port"""
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', METRICS_PORT).start()
+    logger.info(f"Metrics available on port {METRICS_PORT}")
+    return runner
+
+# Shared state configuration
+# With SHARED_STATE on, conversation state, membership results and update
+# claims live in Mongo so several webhook workers can share the load.
+SHARED_STATE = os.getenv('SHARED_STATE', '').lower() in ('1', 'true', 'yes')
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+CONVERSATION_LEASE_SECONDS = float(os.getenv('CONVERSATION_LEASE_SECONDS', 30))
+BROADCAST_LEASE_SECONDS = float(os.getenv('BROADCAST_LEASE_SECONDS', 60))
+PROCESSED_UPDATE_TTL = int(os.getenv('PROCESSED_UPDATE_TTL', 24 * 60 * 60))
+
 # MongoDB connection
-client = MongoClient(os.getenv('MONGODB_URI'))
-db = client[os.getenv('DATABASE_NAME', 'KYC_Bot')]
+# pymongo is blocking, so every query runs on a bounded thread pool sized to
+# match the client's connection pool instead of on the event loop.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 16))
+DB_MIN_POOL_SIZE = int(os.getenv('DB_MIN_POOL_SIZE', 4))
+
+# Connected at startup by connect_database(), not at import time
+client = None
+db = None
 
 # Collections
-users_collection = db['users']
-leaderboard_collection = db['leaderboard']
-admins_collection = db['admins']
-
-# Initialize database with admin user if empty
-if admins_collection.count_documents({}) == 0 and os.getenv('ADMIN_IDS'):
-    for admin_id in CONFIG['admin_ids']:
-        admins_collection.update_one(
-            {'user_id': admin_id},
-            {'$set': {'user_id': admin_id}},
-            upsert=True
-        )
+users_collection = None
+leaderboard_collection = None
+leaderboard_archive_collection = None
+admins_collection = None
+broadcast_jobs_collection = None
+media_cache_collection = None
+conversations_collection = None
+processed_updates_collection = None
+memberships_collection = None
+
+# Indexes backing every hot query path, by collection name
+INDEXES = [
+    ('users', [
+        IndexModel([('user_id', ASCENDING)], unique=True),
+        IndexModel([('join_date', ASCENDING)]),
+        IndexModel([('dead', ASCENDING)], sparse=True),
+    ]),
+    ('leaderboard', [
+        IndexModel([('user_id', ASCENDING)], unique=True),
+        IndexModel([('activation_date', DESCENDING)]),
+    ]),
+    ('leaderboard_archive', [
+        IndexModel([('user_id', ASCENDING), ('activation_date', DESCENDING)]),
+    ]),
+    ('admins', [
+        IndexModel([('user_id', ASCENDING)], unique=True),
+    ]),
+    ('broadcast_jobs', [
+        IndexModel([('status', ASCENDING), ('lease_expires', ASCENDING)]),
+    ]),
+    ('processed_updates', [
+        IndexModel([('created_at', ASCENDING)], expireAfterSeconds=PROCESSED_UPDATE_TTL),
+    ]),
+    ('memberships', [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0),
+    ]),
+]
+
+def connect_database():
+    """Create the MongoDB client and collection handles; safe to call twice"""
+    global client, db, users_collection, leaderboard_collection, admins_collection
+    global broadcast_jobs_collection, media_cache_collection, conversations_collection
+    global processed_updates_collection, memberships_collection, leaderboard_archive_collection
+    if client is not None:
+        return
+    client = MongoClient(os.getenv('MONGODB_URI'), maxPoolSize=DB_POOL_SIZE, minPoolSize=DB_MIN_POOL_SIZE)
+    db = client[os.getenv('DATABASE_NAME', 'KYC_Bot')]
+    users_collection = db['users']
+    leaderboard_collection = db['leaderboard']
+    leaderboard_archive_collection = db['leaderboard_archive']
+    admins_collection = db['admins']
+    broadcast_jobs_collection = db['broadcast_jobs']
+    media_cache_collection = db['media_cache']
+    conversations_collection = db['conversations']
+    processed_updates_collection = db['processed_updates']
+    memberships_collection = db['memberships']
 
 # Webhook configuration
 PORT = int(os.getenv('PORT', 10000))
@@ -113,81 +476,772 @@ KYC_RESPONSES = [
     "💳 *KYC Activated!*\n\n📱 Phone: {phone}\n⭐ Status: Trusted User\n🔓 Restrictions removed!",
 ]
 
+# Pre-rendered keyboards and texts, built once at import
+# (telegram objects are immutable, so they are safe to share between requests)
+START_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✨ Activate KYC", callback_data="activate_kyc")],
+    [InlineKeyboardButton("📊 Leaderboard", callback_data="show_leaderboard"),
+     InlineKeyboardButton("ℹ️ How To Use", callback_data="how_to_use")]
+])
+
+FORCE_JOIN_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton(f"Join {username}", url=link)] for username, link in zip(CHANNEL_USERNAMES, CHANNEL_LINKS)]
+    + [[InlineKeyboardButton("✅ I've Joined", callback_data="verify_join")]]
+)
+
+CONTACT_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📩 Message Admin", url="https://t.me/Silando")],
+    [InlineKeyboardButton("📢 Announcements", url="https://t.me/megahubbots")],
+    [InlineKeyboardButton("💬 Support Channel", url="https://t.me/Freenethubz")]
+])
+
+CANCEL_BROADCAST_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("❌ Cancel", callback_data="cancel_broadcast")]
+])
+
+FORCE_JOIN_MESSAGE = (
+    "🔒 *Access Restricted* 🔒\n\n"
+    "To use this bot, you must join our official channels:\n\n"
+    "👉 Tap each button below to join\n"
+    "👉 Then click 'I've Joined' to verify"
+)
+
+HOW_TO_USE_MESSAGE = """
+📘 <b>KYC Activator Bot Guide</b> 📘
+
+1️⃣ <b>Getting Started</b>
+- Use /start to begin
+- Join required channels if prompted
+
+2️⃣ <b>Activation Process</b>
+- Use /activatekyc
+- Enter your phone number
+- Watch the magic happen!
+
+3️⃣ <b>Features</b>
+- Fun KYC activation simulation
+- Leaderboard tracking
+- Regular updates
+
+4️⃣ <b>Important Notes</b>
+- This is just for entertainment
+- No real KYC is performed
+- No personal data is stored
+
+🎉 Enjoy the experience!
+"""
+
+CONTACT_MESSAGE = """
+📞 *Contact Information* 📞
+
+🔹 *Email:* freenethubbusiness@gmail.com
+🔹 *Business Hours:* 9AM - 5PM (EAT)
+
+📌 *For:*
+- Business inquiries
+- Bug reports
+- Feature requests
+
+🚫 *Please don't spam!*
+━━━━━━━━━━━━━━━━━━━━━━━━━━━
+"""
+
+EMPTY_LEADERBOARD_MESSAGE = "🏆 <b>Leaderboard is empty!</b>\nBe the first with /activatekyc"
+
+def render_leaderboard(entries):
+    """Format leaderboard entries as the HTML leaderboard message"""
+    if not entries:
+        return EMPTY_LEADERBOARD_MESSAGE
+    lines = [
+        "🏆 <b>KYC Activation Leaderboard</b> 🏆\n",
+        "Rank | User       | Phone",
+        "-----|------------|-------",
+    ]
+    for idx, entry in enumerate(entries[:10], 1):
+        username = (entry.get('username') or 'Anonymous')[:10]
+        phone = (entry.get('phone_number') or 'N/A')[:6] + '***'
+        lines.append(f"{idx:<4} | {username:<10} | {phone}")
+    lines.append(f"\nTotal Activations: {len(entries)}")
+    return "\n".join(lines)
+
 # Database Management Functions
-def add_user(user):
-    """Add user to database if not exists"""
-    users_collection.update_one(
-        {'user_id': user.id},
-        {'$set': {
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='mongo')
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking pymongo call on the database thread pool"""
+    owner = getattr(func, '__self__', None)
+    operation = f"{owner.name}.{func.__name__}" if isinstance(owner, Collection) else func.__name__
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(db_executor, lambda: func(*args, **kwargs))
+    except Exception:
+        MONGO_ERRORS.inc(operation)
+        raise
+    finally:
+        MONGO_LATENCY.observe(time.perf_counter() - started, operation)
+
+class UserWriteBuffer:
+    """Write-behind buffer that batches user upserts into bulk writes
+
+    Repeated /start calls from the same user are coalesced into one pending
+    write, and profiles identical to the last one written are skipped.
+    join_date is only set when the document is first inserted, and any write
+    clears the dead flag left by a failed broadcast.
+    """
+
+    def __init__(self, batch_size, flush_interval, remembered):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.remembered = remembered
+        self.pending = {}
+        self.written = OrderedDict()
+        self._flush_needed = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def add(self, user):
+        profile = {
             'username': user.username,
             'first_name': user.first_name,
             'last_name': user.last_name,
-            'join_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }},
-        upsert=True
-    )
+        }
+        if user.id not in self.pending and self.written.get(user.id) == profile:
+            self.written.move_to_end(user.id)
+            return
+        first_seen = self.pending[user.id][1] if user.id in self.pending else datetime.now()
+        self.pending[user.id] = (profile, first_seen)
+        if len(self.pending) >= self.batch_size:
+            self._flush_needed.set()
+
+    async def flush(self):
+        """Write every pending user in a single unordered bulk write"""
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, {}
+            requests = [
+                UpdateOne(
+                    {'user_id': user_id},
+                    {
+                        '$set': profile,
+                        '$setOnInsert': {'join_date': first_seen.strftime('%Y-%m-%d %H:%M:%S')}
+                    },
+                    upsert=True
+                )
+                for user_id, (profile, first_seen) in batch.items()
+            ]
+            try:
+                # Cleared separately so the stats learn how many users came back
+                revived = await run_db(
+                    users_collection.update_many,
+                    {'user_id': {'$in': list(batch)}, 'dead': True},
+                    {'$unset': {'dead': ''}}
+                )
+                stats_service.record_dead(-revived.modified_count)
+                result = await run_db(users_collection.bulk_write, requests, ordered=False)
+            except PyMongoError as e:
+                logger.error(f"Error flushing {len(batch)} user writes: {e}")
+                # Upserts are idempotent, so retry everything that isn't superseded
+                for user_id, pending in batch.items():
+                    self.pending.setdefault(user_id, pending)
+                return
+            stats_service.record_user(result.upserted_count)
+            for user_id, (profile, _) in batch.items():
+                self.written[user_id] = profile
+                self.written.move_to_end(user_id)
+            while len(self.written) > self.remembered:
+                self.written.popitem(last=False)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write anything still pending"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+
+user_write_buffer = UserWriteBuffer(USER_WRITE_BATCH_SIZE, USER_WRITE_INTERVAL, USER_WRITE_REMEMBERED)
+
+def add_user(user):
+    """Add user to database if not exists"""
+    user_write_buffer.add(user)
+
+def seed_admins():
+    """Initialize database with admin users if empty"""
+    if admins_collection.count_documents({}) == 0 and os.getenv('ADMIN_IDS'):
+        for admin_id in CONFIG['admin_ids']:
+            admins_collection.update_one(
+                {'user_id': admin_id},
+                {'$set': {'user_id': admin_id}},
+                upsert=True
+            )
+
+class AdminRegistry:
+    """In-memory set of admin IDs kept in sync with the admins collection
+
+    Changes are picked up from a change stream when the deployment supports
+    one (replica sets and Atlas). Otherwise the collection is polled every
+    ADMIN_POLL_INTERVAL seconds.
+    """
+
+    def __init__(self, static_ids, poll_interval):
+        self.static_ids = frozenset(static_ids)
+        self.ids = self.static_ids
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._task = None
+
+    def __contains__(self, user_id):
+        return user_id in self.ids
+
+    def reload(self):
+        """Replace the admin set with the current contents of the collection"""
+        stored = {admin['user_id'] for admin in admins_collection.find({}, {'user_id': 1, '_id': 0})}
+        self.ids = self.static_ids | stored
+
+    def _watch(self):
+        with admins_collection.watch(max_await_time_ms=1000) as stream:
+            # Catch anything that changed before the stream was opened
+            self.reload()
+            while not self._stop.is_set():
+                if stream.try_next() is not None:
+                    self.reload()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            # Runs on its own thread so it never ties up the database pool
+            await loop.run_in_executor(None, self._watch)
+            return
+        except PyMongoError as e:
+            logger.info(f"Admin change stream unavailable ({e}), polling every {self.poll_interval}s")
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await run_db(self.reload)
+            except PyMongoError as e:
+                logger.error(f"Error refreshing admins: {e}")
+
+    def start(self):
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+admin_registry = AdminRegistry(CONFIG['admin_ids'], ADMIN_POLL_INTERVAL)
 
 def is_admin(user_id):
     """Check if user is admin"""
-    return admins_collection.count_documents({'user_id': user_id}) > 0 or user_id in CONFIG['admin_ids']
-
-def add_kyc_activation(user_id, username, phone_number):
+    return user_id in admin_registry
+
+class LeaderboardCache:
+    """Bounded in-process copy of the most recent leaderboard activations
+
+    Kept current by add_kyc_activation and reloaded from the indexed
+    collection every LEADERBOARD_REFRESH_INTERVAL seconds to pick up writes
+    made by other processes.
+    """
+
+    def __init__(self, size, refresh_interval):
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.entries = []
+        self.loaded_at = None
+        self.version = 0
+        self._rendered = None
+        self._rendered_version = None
+
+    @property
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh_interval
+
+    def load(self, entries):
+        self.entries = list(entries)
+        self.loaded_at = time.monotonic()
+        self.version += 1
+
+    def rendered(self):
+        """Leaderboard message text, re-rendered only when the entries change"""
+        if self._rendered_version != self.version:
+            self._rendered = render_leaderboard(self.entries)
+            self._rendered_version = self.version
+        return self._rendered
+
+    def record(self, entry):
+        """Insert or replace a user's activation, keeping only the newest entries"""
+        entries = [e for e in self.entries if e['user_id'] != entry['user_id']]
+        entries.append(entry)
+        self.entries = heapq.nlargest(self.size, entries, key=lambda e: e['activation_date'])
+        self.version += 1
+
+leaderboard_cache = LeaderboardCache(LEADERBOARD_SIZE, LEADERBOARD_REFRESH_INTERVAL)
+
+async def add_kyc_activation(user_id, username, phone_number):
     """Add KYC activation to leaderboard"""
-    leaderboard_collection.update_one(
+    entry = {
+        'user_id': user_id,
+        'username': username,
+        'phone_number': phone_number,
+        'activation_date': datetime.now()
+    }
+    previous = await run_db(
+        leaderboard_collection.find_one_and_update,
         {'user_id': user_id},
-        {'$set': {
-            'username': username,
-            'phone_number': phone_number,
-            'activation_date': datetime.now()
-        }},
-        upsert=True
+        {'$set': {k: v for k, v in entry.items() if k != 'user_id'}},
+        projection={'activation_date': 1, '_id': 0},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
     )
+    if previous is None:
+        # A returning user's old row may have been archived. Taking it back out
+        # keeps one row per user across both collections, so stats count users.
+        previous = await run_db(
+            leaderboard_archive_collection.find_one_and_delete,
+            {'user_id': user_id},
+            projection={'activation_date': 1, '_id': 0}
+        )
+    leaderboard_cache.record(entry)
+    stats_service.record_activation(entry['activation_date'], previous and previous.get('activation_date'))
+
+async def load_leaderboard():
+    """Reload the leaderboard cache from the database"""
+    def fetch_leaderboard():
+        return list(leaderboard_collection.find({}, {'_id': 0}).sort('activation_date', DESCENDING).limit(LEADERBOARD_SIZE))
 
-def get_leaderboard():
+    leaderboard_cache.load(await run_db(fetch_leaderboard))
+
+async def get_leaderboard():
     """Get top 10 activations from leaderboard"""
-    return list(leaderboard_collection.find().sort('activation_date', -1).limit(10))
+    if leaderboard_cache.stale:
+        await load_leaderboard()
+    return leaderboard_cache.entries
+
+def ensure_indexes():
+    """Create any missing indexes; safe to run on every startup"""
+    for name, indexes in INDEXES:
+        try:
+            db[name].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate user_id rows left over from before the unique index
+            logger.error(f"Could not create indexes on {name}: {e}")
+
+class MediaCache:
+    """Telegram file_ids for media first sent by URL, persisted per URL
+
+    Entries are keyed by the source URL, so pointing a setting at a new URL
+    misses the cache and triggers a fresh upload.
+    """
+
+    def __init__(self):
+        self.file_ids = {}
+
+    async def load(self, *urls):
+        def find_cached():
+            return list(media_cache_collection.find({'_id': {'$in': list(urls)}}))
+
+        docs = await run_db(find_cached)
+        self.file_ids.update({doc['_id']: doc['file_id'] for doc in docs})
+
+    def get(self, url):
+        """Return the cached file_id for url, or url itself if not uploaded yet"""
+        return self.file_ids.get(url, url)
+
+    async def remember(self, url, file_id):
+        if self.file_ids.get(url) == file_id:
+            return
+        self.file_ids[url] = file_id
+        await run_db(
+            media_cache_collection.update_one,
+            {'_id': url},
+            {'$set': {'file_id': file_id, 'updated_at': datetime.now()}},
+            upsert=True
+        )
+
+    async def forget(self, url):
+        self.file_ids.pop(url, None)
+        await run_db(media_cache_collection.delete_one, {'_id': url})
+
+media_cache = MediaCache()
 
-def get_user_count():
+async def get_user_count():
     """Get total number of users"""
-    return users_collection.count_documents({})
+    return await run_db(users_collection.count_documents, {})
+
+async def get_reachable_user_count():
+    """Get number of users not marked dead by a broadcast
+
+    {'dead': {'$ne': True}} can't use the sparse dead index, so the total
+    comes from collection metadata and only the dead users are counted.
+    """
+    total = await run_db(users_collection.estimated_document_count)
+    dead = await run_db(users_collection.count_documents, {'dead': True})
+    return max(0, total - dead)
+
+async def mark_users_dead(user_ids):
+    """Flag users who blocked the bot or no longer exist so broadcasts skip them"""
+    if not user_ids:
+        return
+    result = await run_db(
+        users_collection.update_many,
+        {'user_id': {'$in': list(user_ids)}, 'dead': {'$ne': True}},
+        {'$set': {'dead': True, 'dead_since': datetime.now()}}
+    )
+    stats_service.record_dead(result.modified_count)
+    for user_id in user_ids:
+        # Make sure the user's next /start is written so it clears the flag
+        user_write_buffer.written.pop(user_id, None)
+
+class RollingCounter:
+    """Sliding-window event counter built from fixed-width time buckets"""
+
+    def __init__(self, window, bucket_width):
+        self.bucket_width = bucket_width
+        self.size = int(window // bucket_width)
+        self.counts = [0] * self.size
+        self.bucket_ids = [-1] * self.size
+
+    def add(self, timestamp, count=1):
+        bucket_id = int(timestamp // self.bucket_width)
+        index = bucket_id % self.size
+        if self.bucket_ids[index] != bucket_id:
+            self.bucket_ids[index] = bucket_id
+            self.counts[index] = 0
+        self.counts[index] += count
+
+    def discard(self, timestamp, count=1):
+        """Take back events added at `timestamp`, if their bucket is still live"""
+        bucket_id = int(timestamp // self.bucket_width)
+        index = bucket_id % self.size
+        current = int(time.time() // self.bucket_width)
+        if self.bucket_ids[index] == bucket_id and current - bucket_id < self.size:
+            self.counts[index] = max(0, self.counts[index] - count)
+
+    def total(self, now=None):
+        current = int((now or time.time()) // self.bucket_width)
+        return sum(
+            count for count, bucket_id in zip(self.counts, self.bucket_ids)
+            if 0 <= current - bucket_id < self.size
+        )
+
+    def reset(self):
+        self.counts = [0] * self.size
+        self.bucket_ids = [-1] * self.size
+
+class StatsService:
+    """Rolling dashboard counters, updated incrementally and reconciled with Mongo
+
+    Counters move as users and activations are recorded and are recomputed
+    from the database every STATS_RECONCILE_INTERVAL seconds, which also
+    corrects for writes made by other processes.
+    """
+
+    def __init__(self, reconcile_interval):
+        self.reconcile_interval = reconcile_interval
+        self.total_users = 0
+        self.dead_users = 0
+        self.users_today = 0
+        self.today = datetime.now().date()
+        self.total_activations = 0
+        self.recent_activations = RollingCounter(24 * 60 * 60, 60)
+        self._task = None
+
+    def _roll_day(self):
+        today = datetime.now().date()
+        if today != self.today:
+            self.today = today
+            self.users_today = 0
+
+    def record_user(self, count=1):
+        self._roll_day()
+        self.total_users += count
+        self.users_today += count
+
+    def record_dead(self, count):
+        self.dead_users += count
+
+    def record_activation(self, activation_date, previous_date=None):
+        """Count an activation; totals and the 24h window count users, like reconcile"""
+        if previous_date is None:
+            self.total_activations += 1
+        else:
+            # A repeat activation moves the user's entry instead of adding one
+            self.recent_activations.discard(previous_date.timestamp())
+        self.recent_activations.add(activation_date.timestamp())
+
+    def reconcile(self):
+        """Recompute every counter from the database"""
+        today = datetime.now().date()
+        since = datetime.now() - timedelta(days=1)
+        total_users = users_collection.count_documents({})
+        dead_users = users_collection.count_documents({'dead': True})
+        users_today = users_collection.count_documents({"join_date": {"$gte": today.strftime('%Y-%m-%d')}})
+        # Each user has one row across the two collections, so this counts users
+        # who have activated. Archived rows are never updated, so the metadata
+        # count is exact enough.
+        total_activations = (
+            leaderboard_collection.count_documents({})
+            + leaderboard_archive_collection.estimated_document_count()
+        )
+        recent = RollingCounter(24 * 60 * 60, 60)
+        for entry in leaderboard_collection.find({"activation_date": {"$gte": since}}, {'activation_date': 1, '_id': 0}):
+            recent.add(entry['activation_date'].timestamp())
+        self.total_users = total_users
+        self.dead_users = dead_users
+        self.users_today = users_today
+        self.today = today
+        self.total_activations = total_activations
+        self.recent_activations = recent
+
+    def snapshot(self):
+        self._roll_day()
+        return {
+            'total_users': self.total_users,
+            'reachable_users': self.total_users - self.dead_users,
+            'dead_users': self.dead_users,
+            'users_today': self.users_today,
+            'total_activations': self.total_activations,
+            'activations_24h': self.recent_activations.total(),
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await run_db(self.reconcile)
+            except PyMongoError as e:
+                logger.error(f"Error reconciling stats: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
 
-def get_all_users():
-    """Get all user IDs for broadcasting"""
-    return [user['user_id'] for user in users_collection.find({}, {'user_id': 1})]
+stats_service = StatsService(STATS_RECONCILE_INTERVAL)
+
+# Shared State
+async def claim_update(update_id):
+    """Record an update as taken by this worker; False if another worker has it"""
+    try:
+        await run_db(
+            processed_updates_collection.insert_one,
+            {'_id': update_id, 'worker': WORKER_ID, 'created_at': datetime.utcnow()}
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def acquire_conversation(user_id):
+    """Take the user's conversation lease, returning its token and stored state
+
+    The upsert only matches a free or expired lease. While another worker
+    holds it, the insert collides on _id and we back off and retry.
+    """
+    token = uuid.uuid4().hex
+    delay = 0.02
+    while True:
+        now = datetime.utcnow()
+        try:
+            doc = await run_db(
+                conversations_collection.find_one_and_update,
+                {'_id': user_id, '$or': [
+                    {'lease_expires': {'$exists': False}},
+                    {'lease_expires': {'$lt': now}}
+                ]},
+                {'$set': {
+                    'lease_owner': token,
+                    'lease_expires': now + timedelta(seconds=CONVERSATION_LEASE_SECONDS)
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return token, doc.get('state', {})
+        except DuplicateKeyError:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+async def release_conversation(user_id, token, state):
+    """Store the user's conversation state and give up the lease"""
+    await run_db(
+        conversations_collection.update_one,
+        {'_id': user_id, 'lease_owner': token},
+        {'$set': {'state': state}, '$unset': {'lease_owner': '', 'lease_expires': ''}}
+    )
+
+class SharedMembershipStore:
+    """Membership results shared between workers, expired by a TTL index"""
+
+    async def get(self, user_id, channels):
+        def find_memberships():
+            return list(memberships_collection.find({
+                'user_id': user_id,
+                'channel': {'$in': channels},
+                'expires_at': {'$gt': datetime.utcnow()}
+            }))
+
+        return {doc['channel']: doc['is_member'] for doc in await run_db(find_memberships)}
+
+    async def set(self, user_id, channel, is_member, ttl):
+        await run_db(
+            memberships_collection.update_one,
+            {'_id': f"{user_id}:{channel}"},
+            {'$set': {
+                'user_id': user_id,
+                'channel': channel,
+                'is_member': is_member,
+                'expires_at': datetime.utcnow() + timedelta(seconds=ttl)
+            }},
+            upsert=True
+        )
+
+    async def invalidate(self, user_id):
+        await run_db(memberships_collection.delete_many, {'user_id': user_id})
+
+shared_memberships = SharedMembershipStore() if SHARED_STATE else None
+
+def read_user_id_batch(cursor, batch_size):
+    """Read up to batch_size user IDs from a cursor into a compact array"""
+    batch = array('q')
+    for user in cursor:
+        batch.append(user['user_id'])
+        if len(batch) >= batch_size:
+            break
+    return batch
+
+async def iter_user_id_batches(after=None, batch_size=BROADCAST_BATCH_SIZE):
+    """Stream reachable user IDs in ascending order in fixed-size batches, optionally resuming after a user ID"""
+    query = {'dead': {'$ne': True}}
+    if after is not None:
+        query['user_id'] = {'$gt': after}
+    cursor = users_collection.find(query, {'user_id': 1, '_id': 0}, batch_size=batch_size).sort('user_id', 1)
+    try:
+        while True:
+            batch = await run_db(read_user_id_batch, cursor, batch_size)
+            if not batch:
+                return
+            yield batch
+    finally:
+        await run_db(cursor.close)
+
+class MembershipCache:
+    """LRU cache of (user_id, channel) membership results with separate TTLs"""
+
+    def __init__(self, maxsize, positive_ttl, negative_ttl):
+        self.maxsize = maxsize
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, channel):
+        """Return the cached result, or None if missing or expired"""
+        key = (user_id, channel)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user_id, channel, is_member):
+        """Store a result, evicting the least recently used entry when full"""
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        key = (user_id, channel)
+        self._entries[key] = (is_member, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Drop every cached result for a user"""
+        for channel in CHANNEL_USERNAMES:
+            self._entries.pop((user_id, channel), None)
+
+    def stats(self):
+        """Return hit, miss and eviction counters"""
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+membership_cache = MembershipCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_POSITIVE_TTL, MEMBERSHIP_NEGATIVE_TTL)
+
+async def fetch_channel_membership(user_id: int, channel: str, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Ask the Bot API whether the user is in a channel and cache the answer."""
+    try:
+        chat_member = await context.bot.get_chat_member(channel, user_id)
+        is_member = chat_member.status in ["member", "administrator", "creator"]
+    except BadRequest:
+        is_member = False
+    membership_cache.set(user_id, channel, is_member)
+    if shared_memberships:
+        ttl = MEMBERSHIP_POSITIVE_TTL if is_member else MEMBERSHIP_NEGATIVE_TTL
+        await shared_memberships.set(user_id, channel, is_member, ttl)
+    return is_member
 
 async def is_member_of_channels(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if the user is a member of all required channels."""
+    results = {}
     for channel in CHANNEL_USERNAMES:
-        try:
-            chat_member = await context.bot.get_chat_member(channel, user_id)
-            if chat_member.status not in ["member", "administrator", "creator"]:
-                return False
-        except BadRequest:
-            return False
-    return True
+        cached = membership_cache.get(user_id, channel)
+        if cached is not None:
+            results[channel] = cached
+    missing = [channel for channel in CHANNEL_USERNAMES if channel not in results]
+    if missing and shared_memberships:
+        shared = await shared_memberships.get(user_id, missing)
+        for channel, is_member in shared.items():
+            membership_cache.set(user_id, channel, is_member)
+        results.update(shared)
+        missing = [channel for channel in missing if channel not in shared]
+    fetched = await asyncio.gather(
+        *(fetch_channel_membership(user_id, channel, context) for channel in missing)
+    )
+    return all(results.values()) and all(fetched)
 
 async def send_force_join_message(update: Update):
     """Send force join message with buttons for all channels."""
-    buttons = [[InlineKeyboardButton(f"Join {CHANNEL_USERNAMES[i]}", url=CHANNEL_LINKS[i])] 
-               for i in range(len(CHANNEL_USERNAMES))]
-    buttons.append([InlineKeyboardButton("✅ I've Joined", callback_data="verify_join")])
-    
-    reply_markup = InlineKeyboardMarkup(buttons)
-    
     await update.message.reply_text(
-        "🔒 *Access Restricted* 🔒\n\n"
-        "To use this bot, you must join our official channels:\n\n"
-        "👉 Tap each button below to join\n"
-        "👉 Then click 'I've Joined' to verify",
-        reply_markup=reply_markup,
+        FORCE_JOIN_MESSAGE,
+        reply_markup=FORCE_JOIN_KEYBOARD,
         parse_mode="Markdown"
     )
 
+@instrumented
 async def verify_join_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle join verification callback"""
     query = update.callback_query
     user_id = query.from_user.id
     
+    # The user claims to have just joined, so don't trust cached negatives
+    membership_cache.invalidate(user_id)
+    if shared_memberships:
+        await shared_memberships.invalidate(user_id)
     if await is_member_of_channels(user_id, context):
         await query.answer("✅ Verification successful! You can now use the bot.")
         await query.message.edit_text(
@@ -199,7 +1253,647 @@ async def verify_join_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     else:
         await query.answer("❌ You haven't joined all channels yet!", show_alert=True)
 
+# Broadcast Engine
+class TokenBucket:
+    """Async token bucket limiter that can be paused after a flood wait
+
+    The bucket starts with only `capacity` tokens and never banks more, so
+    the send rate never exceeds `rate` plus that small burst.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        # Below one token acquire() could never succeed
+        self.capacity = max(1, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+# Shared by every broadcast so concurrent jobs can't exceed the global limit
+broadcast_limiter = TokenBucket(BROADCAST_RATE, BROADCAST_BURST)
+active_broadcasts = set()
+
+def broadcast_content_from_message(message, parse_mode=None):
+    """Capture a text, photo or document message as a storable dict"""
+    content = {'parse_mode': parse_mode}
+    if message.text:
+        content.update(
+            type='text',
+            text=message.text,
+            entities=[] if parse_mode else [e.to_dict() for e in message.entities]
+        )
+    elif message.photo:
+        content.update(type='photo', file_id=message.photo[-1].file_id)
+    elif message.document:
+        content.update(type='document', file_id=message.document.file_id)
+    else:
+        return None
+    if content['type'] != 'text':
+        content.update(
+            caption=message.caption,
+            caption_entities=[e.to_dict() for e in message.caption_entities]
+        )
+    return content
+
+async def send_broadcast_content(bot, chat_id, content):
+    """Send stored broadcast content to a single chat"""
+    if content['type'] == 'text':
+        await bot.send_message(
+            chat_id,
+            text=content['text'],
+            entities=MessageEntity.de_list(content['entities'], bot) or None,
+            parse_mode=content['parse_mode']
+        )
+    elif content['type'] == 'photo':
+        await bot.send_photo(
+            chat_id,
+            photo=content['file_id'],
+            caption=content['caption'],
+            caption_entities=MessageEntity.de_list(content['caption_entities'], bot) or None
+        )
+    elif content['type'] == 'document':
+        await bot.send_document(
+            chat_id,
+            document=content['file_id'],
+            caption=content['caption'],
+            caption_entities=MessageEntity.de_list(content['caption_entities'], bot) or None
+        )
+
+def classify_send_error(error):
+    """Sort a send failure into retry_after, transient, dead or failed"""
+    if isinstance(error, RetryAfter):
+        return 'retry_after'
+    if isinstance(error, Forbidden):
+        # Bot was blocked by the user, or the user deleted their account
+        return 'dead'
+    if isinstance(error, BadRequest):
+        message = error.message.lower()
+        if 'chat not found' in message or 'user not found' in message or 'deactivated' in message:
+            return 'dead'
+        return 'failed'
+    if isinstance(error, NetworkError):
+        return 'transient'
+    return 'failed'
+
+class BroadcastJob:
+    """Deliver one message to many users from a pool of rate-limited senders
+
+    Progress is checkpointed to the broadcast_jobs collection after every
+    batch: `cursor` is the last user ID of the last fully processed batch and
+    `sent` lists the IDs already handled in the batch after it. A job that is
+    interrupted resumes from there without messaging anyone twice.
+    """
+
+    def __init__(self, bot, job):
+        self.bot = bot
+        self.job_id = job['_id']
+        self.admin_chat_id = job['admin_chat_id']
+        self.content = job['content']
+        self.total = job['total']
+        self.cursor = job.get('cursor')
+        self.sent = set(job.get('sent', []))
+        self.success = job.get('success', 0)
+        self.failures = job.get('failures', 0)
+        self.dead = []
+        self.dead_count = job.get('dead_count', 0)
+        self._checkpoint_lock = asyncio.Lock()
+        self.resumed = self.cursor is not None or bool(self.sent)
+        self.started = time.monotonic()
+        self.started_processed = self.processed
+
+    @property
+    def processed(self):
+        return self.success + self.failures
+
+    async def checkpoint(self, **fields):
+        """Flag dead recipients, then persist the job's cursor position and counters
+
+        Writing a checkpoint also renews this worker's lease on the job. It
+        returns False if another worker has taken the job over.
+
+        The progress reporter and the batch loop both checkpoint, so writes
+        are serialized: an older snapshot must never land after a newer one.
+        A write already handed to Mongo is waited for even if the caller is
+        cancelled, since the query thread carries on regardless.
+        """
+        async with self._checkpoint_lock:
+            dead, self.dead = self.dead, []
+            await mark_users_dead(dead)
+            write = asyncio.ensure_future(run_db(
+                broadcast_jobs_collection.update_one,
+                {'_id': self.job_id, 'owner': WORKER_ID},
+                {'$set': {
+                    'lease_expires': datetime.utcnow() + timedelta(seconds=BROADCAST_LEASE_SECONDS),
+                    'cursor': self.cursor,
+                    'sent': list(self.sent),
+                    'success': self.success,
+                    'failures': self.failures,
+                    'dead_count': self.dead_count,
+                    'updated_at': datetime.now(),
+                    **fields
+                }}
+            ))
+            try:
+                result = await asyncio.shield(write)
+            except asyncio.CancelledError:
+                await asyncio.wait([write])
+                raise
+        return result.matched_count > 0
+
+    async def deliver(self, user_id):
+        """Send to one user, backing off on flood waits and network errors"""
+        for attempt in range(BROADCAST_MAX_RETRIES + 1):
+            await broadcast_limiter.acquire()
+            try:
+                await send_broadcast_content(self.bot, user_id, self.content)
+                self.success += 1
+                BROADCAST_MESSAGES.inc('success')
+                self.sent.add(user_id)
+                return
+            except Exception as e:
+                error = e
+                kind = classify_send_error(e)
+            if kind == 'retry_after':
+                broadcast_limiter.pause(error.retry_after)
+                await asyncio.sleep(error.retry_after)
+            elif kind == 'transient':
+                logger.warning(f"Network error sending to {user_id} (attempt {attempt + 1}): {error}")
+                await asyncio.sleep(2 ** attempt)
+            else:
+                if kind == 'dead':
+                    self.dead.append(user_id)
+                    self.dead_count += 1
+                else:
+                    logger.warning(f"Failed to send to {user_id}: {error}")
+                break
+        self.failures += 1
+        BROADCAST_MESSAGES.inc(kind)
+        self.sent.add(user_id)
+
+    async def worker(self, queue):
+        while True:
+            user_id = await queue.get()
+            try:
+                await self.deliver(user_id)
+            finally:
+                queue.task_done()
+
+    async def notify_admin(self, text, **kwargs):
+        """Message the admin, best effort: a blocked admin must not stop the job"""
+        try:
+            return await self.bot.send_message(self.admin_chat_id, text, **kwargs)
+        except Exception as e:
+            logger.warning(f"Could not notify admin {self.admin_chat_id} about broadcast {self.job_id}: {e}")
+            return None
+
+    async def report_progress(self, status_msg, owner_task):
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            if not await self.checkpoint():
+                logger.warning(f"Lost the lease on broadcast {self.job_id}, stopping")
+                owner_task.cancel()
+                return
+            if status_msg is None:
+                continue
+            elapsed = time.monotonic() - self.started
+            try:
+                await status_msg.edit_text(
+                    f"📢 *Broadcast in progress*\n\n"
+                    f"📩 Processed: {self.processed}/{self.total}\n"
+                    f"✅ Success: {self.success}\n"
+                    f"❌ Failures: {self.failures}\n"
+                    f"⚡ Rate: {(self.processed - self.started_processed) / elapsed:.1f} msg/s",
+                    parse_mode="Markdown"
+                )
+            except Exception as e:
+                logger.error(f"Error updating broadcast progress: {e}")
+
+    async def run(self):
+        """Run the broadcast to completion and report results to the admin"""
+        if self.resumed:
+            text = f"📢 Resuming broadcast at {self.processed}/{self.total} users..."
+        else:
+            text = f"📢 Preparing to broadcast to {self.total} users..."
+        status_msg = await self.notify_admin(text)
+        queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 4)
+        workers = [asyncio.create_task(self.worker(queue)) for _ in range(BROADCAST_CONCURRENCY)]
+        reporter = asyncio.create_task(self.report_progress(status_msg, asyncio.current_task()))
+        helpers = workers + [reporter]
+        try:
+            async for batch in iter_user_id_batches(after=self.cursor):
+                for user_id in batch:
+                    if user_id not in self.sent:
+                        await queue.put(user_id)
+                await queue.join()
+                self.cursor = batch[-1]
+                self.sent.clear()
+                await self.checkpoint()
+        except asyncio.CancelledError:
+            # Shutting down: settle the senders first so no delivery lands
+            # after the checkpoint, then record exactly who was reached and
+            # release the lease so this or another worker can resume straight away
+            await stop_tasks(helpers)
+            await self.checkpoint(lease_expires=datetime.utcnow())
+            raise
+        finally:
+            await stop_tasks(helpers)
+
+        await self.checkpoint(status='done', finished_at=datetime.now())
+        await self.notify_admin(
+            f"📊 *Broadcast Results*\n\n"
+            f"✅ Success: {self.success}\n"
+            f"❌ Failures: {self.failures}\n"
+            f"🚫 Blocked/Deleted: {self.dead_count}\n"
+            f"📩 Total Sent: {self.processed}",
+            parse_mode="Markdown"
+        )
+
+async def stop_tasks(tasks):
+    """Cancel tasks and wait until every one of them has finished"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def run_broadcast(bot, job):
+    """Run a broadcast job, marking it failed if it raises
+
+    Without this a failed job would stay 'running' and be adopted again
+    after every lease period. If even the failure can't be recorded, the
+    lease lapses and the job is retried once the database is back.
+    """
+    broadcast = BroadcastJob(bot, job)
+    try:
+        await broadcast.run()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.exception(f"Broadcast {broadcast.job_id} failed")
+        try:
+            await broadcast.checkpoint(status='failed', error=str(e), finished_at=datetime.now())
+        except PyMongoError as write_error:
+            logger.error(f"Could not mark broadcast {broadcast.job_id} as failed: {write_error}")
+            return
+        await broadcast.notify_admin(f"⚠️ Broadcast failed: {e}")
+
+def launch_broadcast(bot, job):
+    """Run a broadcast job as a background task so no handler waits on it"""
+    task = asyncio.create_task(run_broadcast(bot, job))
+    active_broadcasts.add(task)
+    task.add_done_callback(active_broadcasts.discard)
+    return task
+
+async def start_broadcast(context: ContextTypes.DEFAULT_TYPE, admin_chat_id, content):
+    """Persist a new broadcast job and start sending it"""
+    if content is None:
+        await context.bot.send_message(admin_chat_id, "⚠️ Only text, photo and document messages can be broadcast.")
+        return
+    job = {
+        'status': 'running',
+        'admin_chat_id': admin_chat_id,
+        'content': content,
+        'total': await get_reachable_user_count(),
+        'cursor': None,
+        'sent': [],
+        'success': 0,
+        'failures': 0,
+        'dead_count': 0,
+        'owner': WORKER_ID,
+        'lease_expires': datetime.utcnow() + timedelta(seconds=BROADCAST_LEASE_SECONDS),
+        'created_at': datetime.now()
+    }
+    result = await run_db(broadcast_jobs_collection.insert_one, job)
+    job['_id'] = result.inserted_id
+    launch_broadcast(context.bot, job)
+
+async def claim_orphaned_broadcast():
+    """Take over one running broadcast whose owner's lease has lapsed"""
+    now = datetime.utcnow()
+    return await run_db(
+        broadcast_jobs_collection.find_one_and_update,
+        {'status': 'running', '$or': [
+            {'lease_expires': {'$exists': False}},
+            {'lease_expires': {'$lt': now}}
+        ]},
+        {'$set': {
+            'owner': WORKER_ID,
+            'lease_expires': now + timedelta(seconds=BROADCAST_LEASE_SECONDS)
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def resume_broadcasts(application: Application):
+    """Restart broadcast jobs left unfinished by a stopped or crashed worker"""
+    while True:
+        job = await claim_orphaned_broadcast()
+        if job is None:
+            return
+        logger.info(f"Resuming broadcast {job['_id']} after user {job.get('cursor')}")
+        launch_broadcast(application.bot, job)
+
+async def watch_orphaned_broadcasts(application: Application):
+    """Periodically adopt broadcasts abandoned by workers that died"""
+    while True:
+        await asyncio.sleep(BROADCAST_LEASE_SECONDS)
+        try:
+            await resume_broadcasts(application)
+        except PyMongoError as e:
+            logger.error(f"Error checking for orphaned broadcasts: {e}")
+
+async def stop_broadcasts(application: Application):
+    """Cancel running broadcasts so each one checkpoints before exit"""
+    for task in list(active_broadcasts):
+        task.cancel()
+    await asyncio.gather(*active_broadcasts, return_exceptions=True)
+
+# Animation Scheduler
+class Animation:
+    """A message being stepped through a list of frames, ending on a final text"""
+
+    def __init__(self, message, frames, final_text, final_parse_mode=None):
+        self.message = message
+        self.steps = list(frames) + [final_text]
+        self.final_parse_mode = final_parse_mode
+        self.started = time.monotonic()
+        self.shown = -1
+        self.not_before = 0.0
+
+    @property
+    def last_step(self):
+        return len(self.steps) - 1
+
+    @property
+    def finished(self):
+        return self.shown >= self.last_step
+
+    def due(self, step):
+        return self.started + (step + 1) * ANIMATION_FRAME_INTERVAL
+
+class AnimationScheduler:
+    """Drive many message animations from one timer heap and worker task
+
+    Frames are edited on timer events instead of sleeping inside handlers.
+    Each animation has at most one edit in flight. When an edit completes
+    late, because of a slow API call, a flood wait or a full edit pool, the
+    next tick jumps straight to the frame that is due now and the
+    intermediate frames are skipped. The final text is always delivered;
+    on shutdown stop() jumps every pending animation straight to it.
+    """
+
+    def __init__(self, max_in_flight):
+        self._timers = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._edits = asyncio.Semaphore(max_in_flight)
+        self._worker = None
+        self._tasks = set()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def play(self, message, frames, final_text, final_parse_mode=None):
+        """Start animating a message and return immediately"""
+        animation = Animation(message, frames, final_text, final_parse_mode)
+        self._schedule(animation, animation.due(0))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return animation
+
+    @property
+    def active(self):
+        return len(self._timers) + len(self._tasks)
+
+    async def stop(self, attempts=3):
+        """Stop the worker and deliver the final text of every pending animation
+
+        Must run while the bot can still make requests. An edit that hits a
+        flood wait is retried after the wait, up to `attempts` times.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        for _ in range(attempts):
+            # In-flight edits reschedule their animation if it isn't finished
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            pending = {id(animation): animation for _, _, animation in self._timers if not animation.finished}
+            self._timers.clear()
+            if not pending:
+                return
+            delay = max(animation.not_before for animation in pending.values()) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await asyncio.gather(*(self._edit(animation, animation.last_step) for animation in pending.values()))
+        self._timers.clear()
+
+    def _schedule(self, animation, when):
+        heapq.heappush(self._timers, (when, next(self._seq), animation))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._timers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._timers[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, animation = heapq.heappop(self._timers)
+            self._tick(animation)
+
+    def _tick(self, animation):
+        now = time.monotonic()
+        if now < animation.not_before:
+            self._schedule(animation, animation.not_before)
+            return
+        elapsed_steps = int((now - animation.started) / ANIMATION_FRAME_INTERVAL) - 1
+        step = max(animation.shown + 1, min(elapsed_steps, animation.last_step))
+        self.frames_skipped += step - animation.shown - 1
+        task = asyncio.create_task(self._edit(animation, step))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _edit(self, animation, step):
+        is_final = step == animation.last_step
+        try:
+            async with self._edits:
+                if is_final:
+                    await animation.message.edit_text(animation.steps[step], parse_mode=animation.final_parse_mode)
+                else:
+                    await animation.message.edit_text(animation.steps[step])
+            self.frames_sent += 1
+            animation.shown = step
+        except RetryAfter as e:
+            animation.not_before = time.monotonic() + e.retry_after
+            if not is_final:
+                animation.shown = step
+        except Exception as e:
+            logger.error(f"Error updating animation frame: {e}")
+            animation.shown = step
+        if not animation.finished:
+            self._schedule(animation, max(animation.due(animation.shown + 1), animation.not_before))
+
+animation_scheduler = AnimationScheduler(ANIMATION_MAX_IN_FLIGHT)
+
+async def send_welcome_photo(context: ContextTypes.DEFAULT_TYPE, chat_id, reply_markup):
+    """Send the welcome photo, uploading it by URL only the first time"""
+    url = CONFIG['welcome_image']
+    photo = media_cache.get(url)
+    try:
+        message = await context.bot.send_photo(
+            chat_id=chat_id,
+            photo=photo,
+            caption=WELCOME_MESSAGE,
+            parse_mode="Markdown",
+            reply_markup=reply_markup
+        )
+    except BadRequest:
+        if photo == url:
+            raise
+        # The stored file_id is no longer valid, fall back to the URL
+        await media_cache.forget(url)
+        return await send_welcome_photo(context, chat_id, reply_markup)
+    await media_cache.remember(url, message.photo[-1].file_id)
+    return message
+
+# Export and Archival
+# Fields written per collection; CSV needs a fixed header, NDJSON keeps whole documents
+EXPORT_FIELDS = {
+    'users': ['user_id', 'username', 'first_name', 'last_name', 'join_date', 'dead'],
+    'leaderboard': ['user_id', 'username', 'phone_number', 'activation_date'],
+    'leaderboard_archive': ['user_id', 'username', 'phone_number', 'activation_date'],
+}
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+def export_collection(name, fmt, out_dir, chunk_rows=EXPORT_CHUNK_ROWS, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a collection into gzip-compressed NDJSON or CSV chunk files
+
+    Documents are read through a batched cursor in _id order and written as
+    they arrive, so memory use stays flat however large the collection is.
+    Returns the chunk paths and the number of rows written.
+    """
+    fields = EXPORT_FIELDS[name]
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    projection = None if fmt == 'ndjson' else dict.fromkeys(fields, 1)
+    cursor = db[name].find({}, projection).sort('_id', ASCENDING).batch_size(batch_size)
+    paths = []
+    rows = 0
+    out = writer = None
+    try:
+        for doc in cursor:
+            if out is None or rows % chunk_rows == 0:
+                if out is not None:
+                    out.close()
+                path = os.path.join(out_dir, f"{name}-{stamp}-{len(paths) + 1:04d}.{fmt}.gz")
+                out = gzip.open(path, 'wt', encoding='utf-8', newline='')
+                paths.append(path)
+                if fmt == 'csv':
+                    writer = csv.DictWriter(out, fields, extrasaction='ignore')
+                    writer.writeheader()
+            if fmt == 'csv':
+                writer.writerow(doc)
+            else:
+                out.write(json_util.dumps(doc))
+                out.write('\n')
+            rows += 1
+    finally:
+        cursor.close()
+        if out is not None:
+            out.close()
+    return paths, rows
+
+def archive_leaderboard(days=LEADERBOARD_ARCHIVE_DAYS, batch_size=EXPORT_BATCH_SIZE):
+    """Move leaderboard rows older than `days` into leaderboard_archive
+
+    Each batch is copied before it is deleted, keeping the original _id, so a
+    run interrupted between the two steps is finished by the next one. Only
+    rows still older than the cutoff are deleted, so a re-activation that
+    lands mid-batch is kept.
+    Returns the number of rows moved.
+    """
+    cutoff = datetime.now() - timedelta(days=days)
+    moved = 0
+    while True:
+        batch = list(
+            leaderboard_collection.find({'activation_date': {'$lt': cutoff}})
+            .sort('activation_date', ASCENDING)
+            .limit(batch_size)
+        )
+        if not batch:
+            return moved
+        # Replacing by _id overwrites copies left behind by an interrupted run
+        leaderboard_archive_collection.bulk_write(
+            [ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in batch],
+            ordered=False
+        )
+        ids = [doc['_id'] for doc in batch]
+        # A user who re-activated since the find keeps their upserted row (same _id)
+        result = leaderboard_collection.delete_many({'_id': {'$in': ids}, 'activation_date': {'$lt': cutoff}})
+        if result.deleted_count < len(batch):
+            # Those rows are live again, so their archived copies go
+            kept = leaderboard_collection.distinct('_id', {'_id': {'$in': ids}})
+            leaderboard_archive_collection.delete_many({'_id': {'$in': kept}})
+        moved += result.deleted_count
+
+async def run_archival():
+    """Archive old leaderboard rows every ARCHIVE_INTERVAL seconds"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            # Not run_db, for the same reason as send_export
+            moved = await loop.run_in_executor(None, archive_leaderboard)
+            if moved:
+                logger.info(f"Archived {moved} leaderboard rows older than {LEADERBOARD_ARCHIVE_DAYS:g} days")
+        except PyMongoError as e:
+            logger.error(f"Leaderboard archival failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+active_exports = set()
+
+async def send_export(bot, chat_id, name, fmt):
+    """Export a collection to temporary files and send them as documents"""
+    loop = asyncio.get_running_loop()
+    try:
+        with tempfile.TemporaryDirectory(prefix='kyc-export-') as out_dir:
+            # Not run_db: a long export would hold one of the query threads throughout
+            paths, rows = await loop.run_in_executor(None, export_collection, name, fmt, out_dir)
+            for path in paths:
+                with open(path, 'rb') as document:
+                    await bot.send_document(chat_id, document, filename=os.path.basename(path))
+        await bot.send_message(
+            chat_id,
+            f"📦 *Export Complete*\n\n{name}: {rows} rows in {len(paths)} file(s)",
+            parse_mode="Markdown"
+        )
+    except Exception as e:
+        logger.error(f"Export of {name} failed: {e}")
+        await bot.send_message(chat_id, f"⚠️ Export of {name} failed.")
+
 # Command Handlers
+@instrumented
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /start command with welcome image."""
     user = update.effective_user
@@ -209,28 +1903,17 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await send_force_join_message(update)
         return
 
-    keyboard = [
-        [InlineKeyboardButton("✨ Activate KYC", callback_data="activate_kyc")],
-        [InlineKeyboardButton("📊 Leaderboard", callback_data="show_leaderboard"),
-         InlineKeyboardButton("ℹ️ How To Use", callback_data="how_to_use")]
-    ]
-    
     try:
-        await context.bot.send_photo(
-            chat_id=user.id,
-            photo=CONFIG['welcome_image'],
-            caption=WELCOME_MESSAGE,
-            parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await send_welcome_photo(context, user.id, START_KEYBOARD)
     except Exception as e:
         logger.error(f"Error sending welcome image: {e}")
         await update.message.reply_text(
             WELCOME_MESSAGE,
             parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=START_KEYBOARD
         )
 
+@instrumented
 async def activate_kyc(update: Union[Update, CallbackQueryHandler], context: ContextTypes.DEFAULT_TYPE):
     """Handle KYC activation."""
     user = update.effective_user
@@ -249,115 +1932,59 @@ async def activate_kyc(update: Union[Update, CallbackQueryHandler], context: Con
     )
     context.user_data["awaiting_phone_number"] = True
 
+@instrumented
 async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle leaderboard callback from inline button."""
     query = update.callback_query
     await query.answer()
     await leaderboard(update, context)
 
+@instrumented
 async def leaderboard(update: Union[Update, CallbackQueryHandler], context: ContextTypes.DEFAULT_TYPE):
     """Enhanced leaderboard command."""
-    leaderboard_data = get_leaderboard()
-    
-    if not leaderboard_data:
-        text = "🏆 <b>Leaderboard is empty!</b>\nBe the first with /activatekyc"
-        if isinstance(update, Update) and update.message:
-            await update.message.reply_text(text, parse_mode="HTML")
-        elif update.callback_query:
-            await update.callback_query.message.edit_text(text, parse_mode="HTML")
-        return
-
-    leaderboard_text = "🏆 <b>KYC Activation Leaderboard</b> 🏆\n\n"
-    leaderboard_text += "Rank | User       | Phone\n"
-    leaderboard_text += "-----|------------|-------\n"
-    
-    for idx, entry in enumerate(leaderboard_data[:10], 1):
-        username = entry.get('username', 'Anonymous')[:10]
-        phone = entry.get('phone_number', 'N/A')[:6] + '***'
-        leaderboard_text += f"{idx:<4} | {username:<10} | {phone}\n"
-    
-    leaderboard_text += f"\nTotal Activations: {len(leaderboard_data)}"
+    await get_leaderboard()
+    leaderboard_text = leaderboard_cache.rendered()
 
     if isinstance(update, Update) and update.message:
         await update.message.reply_text(leaderboard_text, parse_mode="HTML")
     elif update.callback_query:
         await update.callback_query.message.edit_text(leaderboard_text, parse_mode="HTML")
 
+@instrumented
 async def how_to_use(update: Union[Update, CallbackQueryHandler], context: ContextTypes.DEFAULT_TYPE):
     """Handle how-to-use command from button or command."""
-    instructions = """
-📘 <b>KYC Activator Bot Guide</b> 📘
-
-1️⃣ <b>Getting Started</b>
-- Use /start to begin
-- Join required channels if prompted
-
-2️⃣ <b>Activation Process</b>
-- Use /activatekyc
-- Enter your phone number
-- Watch the magic happen!
-
-3️⃣ <b>Features</b>
-- Fun KYC activation simulation
-- Leaderboard tracking
-- Regular updates
-
-4️⃣ <b>Important Notes</b>
-- This is just for entertainment
-- No real KYC is performed
-- No personal data is stored
-
-🎉 Enjoy the experience!
-"""
     if isinstance(update, Update) and update.message:
-        await update.message.reply_text(instructions, parse_mode="HTML")
+        await update.message.reply_text(HOW_TO_USE_MESSAGE, parse_mode="HTML")
     elif update.callback_query:
-        await update.callback_query.message.edit_text(instructions, parse_mode="HTML")
+        await update.callback_query.message.edit_text(HOW_TO_USE_MESSAGE, parse_mode="HTML")
 
 # Broadcast Functionality
+@instrumented
 async def contact_us(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced contact us command."""
-    keyboard = [
-        [InlineKeyboardButton("📩 Message Admin", url="https://t.me/Silando")],
-        [InlineKeyboardButton("📢 Announcements", url="https://t.me/megahubbots")],
-        [InlineKeyboardButton("💬 Support Channel", url="https://t.me/Freenethubz")]
-    ]
-    
-    contact_text = """
-📞 *Contact Information* 📞
-
-🔹 *Email:* freenethubbusiness@gmail.com
-🔹 *Business Hours:* 9AM - 5PM (EAT)
-
-📌 *For:*
-- Business inquiries
-- Bug reports
-- Feature requests
-
-🚫 *Please don't spam!*
-━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
     await update.message.reply_text(
-        contact_text,
+        CONTACT_MESSAGE,
         parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=CONTACT_KEYBOARD
     )
 
+@instrumented
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced stats command."""
     if not is_admin(update.effective_user.id):
         await update.message.reply_text("⛔ *Access Denied*", parse_mode="Markdown")
         return
 
-    user_count = get_user_count()
-    activated_count = leaderboard_collection.count_documents({})
-    
+    snapshot = stats_service.snapshot()
+
     stats_text = """
 📈 *Bot Statistics Dashboard* 📈
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 👥 *Users:*
 ├─ Total: {}
-└─ Active Today: {}
+├─ Reachable: {}
+├─ Dead: {}
+└─ New Today: {}
 
 ✅ *Activations:*
 ├─ Total: {}
@@ -368,14 +1995,17 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
 └─ Status: Operational
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """.format(
-        user_count,
-        users_collection.count_documents({"join_date": {"$gte": datetime.now().strftime('%Y-%m-%d')}}),
-        activated_count,
-        leaderboard_collection.count_documents({"activation_date": {"$gte": datetime.now().replace(hour=0, minute=0, second=0)}})
+        snapshot['total_users'],
+        snapshot['reachable_users'],
+        snapshot['dead_users'],
+        snapshot['users_today'],
+        snapshot['total_activations'],
+        snapshot['activations_24h']
     )
 
     await update.message.reply_text(stats_text, parse_mode="Markdown")
 
+@instrumented
 async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Broadcast command to send a message to all users."""
     if not is_admin(update.effective_user.id):
@@ -384,45 +2014,50 @@ async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if "broadcasting" not in context.user_data:
         context.user_data["broadcasting"] = True
-        keyboard = [[InlineKeyboardButton("❌ Cancel", callback_data="cancel_broadcast")]]
         await update.message.reply_text(
             "📢 *Broadcast Mode Enabled*\n\n"
             "Please send the message you want to broadcast to all users.\n\n"
             "If you want to cancel, click the button below.",
             parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=CANCEL_BROADCAST_KEYBOARD
         )
         return
 
-    # Broadcast the user's message
-    user_ids = get_all_users()
-    success = 0
-    failures = 0
-
-    for user_id in user_ids:
-        try:
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=update.message.text,
-                parse_mode="Markdown"
-            )
-            success += 1
-            await asyncio.sleep(0.1)  # Rate limiting
-        except Exception as e:
-            logger.warning(f"Failed to send to {user_id}: {e}")
-            failures += 1
-
-    await update.message.reply_text(
-        f"📊 *Broadcast Results*\n\n"
-        f"✅ Success: {success}\n"
-        f"❌ Failures: {failures}\n"
-        f"📩 Total Sent: {success + failures}\n",
-        parse_mode="Markdown"
+    # Broadcast the user's message in the background
+    await start_broadcast(
+        context,
+        update.effective_chat.id,
+        broadcast_content_from_message(update.message, parse_mode="Markdown")
     )
 
     # Reset broadcasting state
     context.user_data["broadcasting"] = False
 
+@instrumented
+async def export_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Export a collection as compressed NDJSON or CSV files."""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("⛔ *Access Denied*", parse_mode="Markdown")
+        return
+
+    args = context.args or []
+    name = args[0] if args else ''
+    fmt = args[1] if len(args) > 1 else 'ndjson'
+    if name not in EXPORT_FIELDS or fmt not in EXPORT_FORMATS:
+        await update.message.reply_text(
+            "📦 *Usage:* `/export <collection> [format]`\n\n"
+            f"Collections: {', '.join(EXPORT_FIELDS)}\n"
+            f"Formats: {', '.join(EXPORT_FORMATS)}",
+            parse_mode="Markdown"
+        )
+        return
+
+    await update.message.reply_text(f"📦 Exporting {name} as {fmt}...")
+    task = asyncio.create_task(send_export(context.bot, update.effective_chat.id, name, fmt))
+    active_exports.add(task)
+    task.add_done_callback(active_exports.discard)
+
+@instrumented
 async def cancel_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel the broadcast process."""
     query = update.callback_query
@@ -430,56 +2065,16 @@ async def cancel_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer("Broadcast canceled.")
     await query.message.edit_text("📢 *Broadcast Canceled*", parse_mode="Markdown")
 
+@instrumented
 async def handle_broadcast_content(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the actual broadcast content."""
     if not context.user_data.get('awaiting_broadcast'):
         return
 
-    user_ids = get_all_users()
-    success = 0
-    failures = 0
-
-    await update.message.reply_text(f"📢 Preparing to broadcast to {len(user_ids)} users...")
-
-    # Handle different message types
-    for user_id in user_ids:
-        try:
-            if update.message.text:
-                await context.bot.send_message(
-                    user_id,
-                    text=update.message.text,
-                    parse_mode=update.message.parse_mode
-                )
-            elif update.message.photo:
-                await context.bot.send_photo(
-                    user_id,
-                    photo=update.message.photo[-1].file_id,
-                    caption=update.message.caption,
-                    parse_mode=update.message.parse_mode
-                )
-            elif update.message.document:
-                await context.bot.send_document(
-                    user_id,
-                    document=update.message.document.file_id,
-                    caption=update.message.caption,
-                    parse_mode=update.message.parse_mode
-                )
-            
-            success += 1
-            await asyncio.sleep(0.1)  # Rate limiting
-        except Exception as e:
-            logger.warning(f"Failed to send to {user_id}: {e}")
-            failures += 1
-
     context.user_data['awaiting_broadcast'] = False
-    await update.message.reply_text(
-        f"📊 *Broadcast Results*\n\n"
-        f"✅ Success: {success}\n"
-        f"❌ Failures: {failures}\n"
-        f"📩 Total Sent: {success + failures}",
-        parse_mode="Markdown"
-    )
+    await start_broadcast(context, update.effective_chat.id, broadcast_content_from_message(update.message))
 
+@instrumented
 async def handle_phone_number(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the user's phone number input."""
     if context.user_data.get("awaiting_phone_number"):
@@ -487,33 +2082,245 @@ async def handle_phone_number(update: Update, context: ContextTypes.DEFAULT_TYPE
         user = update.effective_user
         
         context.user_data["awaiting_phone_number"] = False
-        add_kyc_activation(user.id, user.username, phone_number)
+        await add_kyc_activation(user.id, user.username, phone_number)
 
-        # Enhanced activation animation
+        # Enhanced activation animation, driven by the shared scheduler
         progress_msg = await update.message.reply_text("🔄 *Starting KYC Activation...*", parse_mode="Markdown")
-        
-        for frame in PROGRESS_FRAMES:
-            await asyncio.sleep(0.7)
-            try:
-                await progress_msg.edit_text(frame)
-            except Exception as e:
-                logger.error(f"Error updating progress: {e}")
-
-        for frame in SIGNAL_FRAMES:
-            await asyncio.sleep(0.7)
-            try:
-                await progress_msg.edit_text(frame)
-            except Exception as e:
-                logger.error(f"Error updating signal: {e}")
-
-        # Send final response
         response = random.choice(KYC_RESPONSES).format(phone=phone_number)
-        await progress_msg.edit_text(response, parse_mode="Markdown")
+        animation_scheduler.play(progress_msg, PROGRESS_FRAMES + SIGNAL_FRAMES, response, final_parse_mode="Markdown")
+
+# Update Processing
+class UserRateLimiter:
+    """Per-user token bucket stored as one timestamp per user in a bounded LRU
+
+    Uses the generic cell rate algorithm: each user keeps only the time at
+    which their bucket will be full again. An update is allowed while that
+    time is no more than `burst` intervals ahead of now. Users evicted from
+    the LRU simply start again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, maxsize):
+        self.interval = 1 / rate
+        self.tolerance = self.interval * (burst - 1)
+        self.maxsize = maxsize
+        self._arrivals = OrderedDict()
+        self.allowed = 0
+        self.shed = 0
+
+    def allow(self, user_id):
+        now = time.monotonic()
+        arrival = max(self._arrivals.get(user_id, now), now)
+        if arrival - now > self.tolerance:
+            self.shed += 1
+            return False
+        self._arrivals[user_id] = arrival + self.interval
+        self._arrivals.move_to_end(user_id)
+        if len(self._arrivals) > self.maxsize:
+            self._arrivals.popitem(last=False)
+        self.allowed += 1
+        return True
+
+user_rate_limiter = UserRateLimiter(USER_RATE_LIMIT, USER_RATE_BURST, USER_RATE_LIMITER_SIZE)
+
+def update_kind(update):
+    """Short label for what an update carries, used in metrics"""
+    if update.callback_query:
+        return 'callback'
+    if update.message and update.message.text and update.message.text.startswith('/'):
+        return 'command'
+    return 'message'
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates concurrently across users but strictly in order per user
+
+    Waiting for a user's lock happens before a concurrency slot is taken, so a
+    user with a backlog of updates can't starve everyone else. asyncio.Lock
+    wakes waiters in FIFO order, which keeps each user's updates in arrival order.
+
+    The library's own semaphore is taken before do_process_update runs, so it
+    is sized to never block; max_concurrent_updates is enforced by a private
+    semaphore taken after the user's lock.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(sys.maxsize)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._user_locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        user = update.effective_user if isinstance(update, Update) else None
+        # Shed floods before any handler, database or Bot API work happens
+        if user is not None and not is_admin(user.id) and not user_rate_limiter.allow(user.id):
+            UPDATES_SHED.inc(update_kind(update))
+            coroutine.close()
+            return
+        if user is None:
+            if await self.admit(update):
+                async with self._slots:
+                    await self.run_update(update, coroutine)
+            else:
+                coroutine.close()
+            return
+
+        entry = self._user_locks.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                # Admitted under the lock, so a slow admit can't reorder the user's updates
+                if not await self.admit(update):
+                    coroutine.close()
+                    return
+                async with self._slots:
+                    await self.run_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._user_locks[user.id]
+
+    async def admit(self, update):
+        """Hook for deciding whether this worker should process the update"""
+        return True
+
+    async def run_update(self, update, coroutine):
+        """Hook that runs the handlers once the update holds a slot"""
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+class SharedStateUpdateProcessor(PerUserUpdateProcessor):
+    """PerUserUpdateProcessor for several workers sharing one bot
+
+    Each update is claimed by update_id before it runs, so a redelivered
+    update is handled once. The user's context.user_data is loaded from
+    and saved back to Mongo under a lease, which also serializes one user's
+    updates across workers.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self.application = None
+
+    async def admit(self, update):
+        return not isinstance(update, Update) or await claim_update(update.update_id)
+
+    async def run_update(self, update, coroutine):
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            await coroutine
+            return
+        token, state = await acquire_conversation(user.id)
+        user_data = self.application.user_data[user.id]
+        user_data.clear()
+        user_data.update(state)
+        try:
+            await coroutine
+        finally:
+            await release_conversation(user.id, token, dict(user_data))
 
 # Main application setup
-def main():
-    """Run the bot."""
-    application = Application.builder().token(CONFIG['token']).build()
+async def connect_and_warm():
+    """Connect to MongoDB and wait until the server answers"""
+    await run_db(connect_database)
+    # minPoolSize keeps opening connections in the background after this
+    await run_db(client.admin.command, 'ping')
+
+async def load_admins():
+    await run_db(seed_admins)
+    await run_db(admin_registry.reload)
+
+async def provision(application: Application):
+    """Build indexes and warm the remaining caches concurrently, then resume broadcasts"""
+    started = time.monotonic()
+    steps = {
+        'indexes': run_db(ensure_indexes),
+        'leaderboard': load_leaderboard(),
+        'media': media_cache.load(CONFIG['welcome_image']),
+    }
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.error(f"Startup step '{name}' failed: {result}")
+    await resume_broadcasts(application)
+    STARTUP_SECONDS['provision'] = time.monotonic() - started
+    STARTUP_SECONDS['ready'] = time.monotonic() - PROCESS_STARTED
+    logger.info(
+        f"Cold start finished in {STARTUP_SECONDS['ready']:.2f}s "
+        f"(connect {STARTUP_SECONDS['connect']:.2f}s, provisioning {STARTUP_SECONDS['provision']:.2f}s)"
+    )
+
+async def post_init(application: Application):
+    """Connect to MongoDB and start background services
+
+    The connection, the admin set and the stats counters are awaited here,
+    since handlers have no fallback for them. Provisioning runs as a task, so
+    it overlaps webhook registration and the start of polling. Until it
+    finishes, the leaderboard is loaded on first use and the welcome photo
+    is sent by URL.
+    """
+    started = time.monotonic()
+    await connect_and_warm()
+    STARTUP_SECONDS['connect'] = time.monotonic() - started
+    steps = {'admins': load_admins(), 'stats': run_db(stats_service.reconcile)}
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.error(f"Startup step '{name}' failed: {result}")
+    admin_registry.start()
+    stats_service.start()
+    user_write_buffer.start()
+    application.bot_data['provisioning'] = asyncio.create_task(provision(application))
+    application.bot_data['orphan_watcher'] = asyncio.create_task(watch_orphaned_broadcasts(application))
+    application.bot_data['lag_monitor'] = asyncio.create_task(monitor_event_loop_lag())
+    application.bot_data['archival'] = asyncio.create_task(run_archival())
+    if METRICS_PORT:
+        application.bot_data['metrics_runner'] = await start_metrics_server()
+
+async def post_stop(application: Application):
+    """Stop background work before the bot shuts down"""
+    for name in ('provisioning', 'orphan_watcher', 'archival'):
+        if name in application.bot_data:
+            application.bot_data[name].cancel()
+    for task in list(active_exports):
+        task.cancel()
+    await stop_broadcasts(application)
+    await animation_scheduler.stop()
+    await user_write_buffer.stop()
+    await admin_registry.stop()
+    await stats_service.stop()
+    if 'lag_monitor' in application.bot_data:
+        application.bot_data['lag_monitor'].cancel()
+    if 'metrics_runner' in application.bot_data:
+        await application.bot_data['metrics_runner'].cleanup()
+
+async def post_shutdown(application: Application):
+    """Release the database connection pool and its worker threads"""
+    if client is not None:
+        await run_db(client.close)
+    db_executor.shutdown(wait=False)
+
+def build_application():
+    """Build the Application with every handler registered."""
+    if SHARED_STATE:
+        update_processor = SharedStateUpdateProcessor(MAX_CONCURRENT_UPDATES)
+    else:
+        update_processor = PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES)
+    application = (
+        Application.builder()
+        .token(CONFIG['token'])
+        .base_url(CONFIG['api_base_url'])
+        .request(InstrumentedRequest(connection_pool_size=BOT_API_POOL_SIZE))
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    if SHARED_STATE:
+        update_processor.application = application
     
     # Command handlers
     application.add_handler(CommandHandler("start", start))
@@ -523,6 +2330,7 @@ def main():
     application.add_handler(CommandHandler("contactus", contact_us))
     application.add_handler(CommandHandler("stats", stats))
     application.add_handler(CommandHandler("broadcast", broadcast_message))
+    application.add_handler(CommandHandler("export", export_data))
     
     # Callback handlers
     application.add_handler(CallbackQueryHandler(verify_join_callback, pattern="^verify_join$"))
@@ -535,7 +2343,12 @@ def main():
     # Message handlers
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex(r'^/'), handle_phone_number))
     application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, handle_broadcast_content))
-    
+    return application
+
+def main():
+    """Run the bot."""
+    application = build_application()
+
     # Start the bot
     if os.getenv('RENDER'):
         application.run_webhook(
@@ -547,6 +2360,34 @@ def main():
     else:
         application.run_polling()
 
+def cli(argv=None):
+    """Run the bot, or export and archive data from the command line."""
+    parser = argparse.ArgumentParser(description="KYC Activator bot")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('run', help="run the bot (default)")
+    export = commands.add_parser('export', help="stream a collection to gzip-compressed files")
+    export.add_argument('collection', choices=list(EXPORT_FIELDS))
+    export.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    export.add_argument('--out', default='.', help="output directory")
+    export.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS, help="rows per file")
+    archive = commands.add_parser('archive', help="move old leaderboard rows to leaderboard_archive")
+    archive.add_argument('--days', type=float, default=LEADERBOARD_ARCHIVE_DAYS)
+    args = parser.parse_args(argv)
+
+    if args.command in (None, 'run'):
+        main()
+        return
+    connect_database()
+    if args.command == 'export':
+        os.makedirs(args.out, exist_ok=True)
+        paths, rows = export_collection(args.collection, args.format, args.out, args.chunk_rows)
+        for path in paths:
+            print(path)
+        print(f"{rows} rows exported", file=sys.stderr)
+    elif args.command == 'archive':
+        ensure_indexes()
+        print(f"{archive_leaderboard(args.days)} rows archived", file=sys.stderr)
+
 if __name__ == "__main__":
-    main()
+    cli()
 